@@ -22,6 +22,57 @@ module tb ();
   wire [7:0] uo_out;
   wire [7:0] uio_out;
   wire [7:0] uio_oe;
+
+  // Generate the 16 ns (64 MHz) clock here rather than from cocotb, so the
+  // simulator does not have to call into Python on every clock edge.
+  initial begin
+    clk = 1'b0;
+    forever #8 clk = ~clk;
+  end
+
+  // Models of the external 74165 (input) and 74595 (output) shift registers
+  // used by the gpio24 chroma.  They sample uo_out on each clock:
+  //   uo_out[1] - 74165 load_bar (active low)
+  //   uo_out[2] - 74595 store
+  //   uo_out[5] - 74595 serial data in
+  //   uo_out[7] - shift clock for both
+  // While sim_gpio24_en is set the 74165 serial output drives ui_in[0].
+  reg        sim_gpio24_en;
+  reg [23:0] sim_input_value;
+  reg [23:0] sim_input_shift;
+  reg [23:0] sim_output_shift;
+  reg [23:0] sim_output_value;
+  reg  [7:0] sim_uo_out_p;
+
+  initial begin
+    sim_gpio24_en    = 1'b0;
+    sim_input_value  = 24'h0;
+    sim_input_shift  = 24'h0;
+    sim_output_shift = 24'h0;
+    sim_output_value = 24'h0;
+    sim_uo_out_p     = 8'h0;
+  end
+
+  always @(posedge clk) begin
+    if (sim_gpio24_en) begin
+      sim_uo_out_p <= uo_out;
+
+      // 74165: load while load_bar is low, else shift left on shift clock
+      if (!uo_out[1])
+        sim_input_shift <= sim_input_value;
+      else if (uo_out[7] && !sim_uo_out_p[7])
+        sim_input_shift <= {sim_input_shift[22:0], 1'b0};
+
+      // 74595: latch output on store, else shift in uo_out[5] on shift clock
+      if (uo_out[2])
+        sim_output_value <= sim_output_shift;
+      else if (uo_out[7] && !sim_uo_out_p[7])
+        sim_output_shift <= {sim_output_shift[22:0], uo_out[5]};
+    end
+  end
+
+  wire [7:0] ui_in_dut = {ui_in[7:1], sim_gpio24_en ? sim_input_shift[23] : ui_in[0]};
+
 `ifdef GL_TEST
   wire VPWR = 1'b1;
   wire VGND = 1'b0;
@@ -45,7 +96,7 @@ module tb ();
 `endif
 `endif
 
-      .ui_in  (ui_in),    // Dedicated inputs
+      .ui_in  (ui_in_dut), // Dedicated inputs
       .uo_out (uo_out),   // Dedicated outputs
       .uio_in (uio_in),   // IOs: Input path
       .uio_out(uio_out),  // IOs: Output path
@@ -0,0 +1,62 @@
+# Runs each cocotb test in test.py as a separate simulation, so the tests can
+# be spread over several cores with pytest-xdist.  Run it from this directory:
+#
+#   pytest -n auto test_runner.py
+#
+# Each test is built in its own sim_build/<testcase> directory, so the design
+# is compiled once per test.  As with the Makefile, SIM selects the simulator
+# (default icarus) and EXTRA_ARGS adds simulator compile arguments.
+
+import ast
+import glob
+import os
+
+import pytest
+from cocotb_test.simulator import run
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TEST_DIR, "..", "src")
+
+def makefile_sources():
+    '''
+       Returns the RTL sources listed in PROJECT_SOURCES and ADDITIONAL_SOURCES
+       of the Makefile, with wildcards expanded, followed by tb.v
+    '''
+    sources = []
+    with open(os.path.join(TEST_DIR, "Makefile")) as f:
+        for line in f:
+            name, sep, value = line.partition("=")
+            if sep and name.strip() in ("PROJECT_SOURCES", "ADDITIONAL_SOURCES"):
+                for source in value.split():
+                    sources += sorted(glob.glob(os.path.join(SRC_DIR, source)))
+    return sources + [os.path.join(TEST_DIR, "tb.v")]
+
+def cocotb_tests():
+    '''
+       Returns the names of the @cocotb.test() functions in test.py, in file order
+    '''
+    with open(os.path.join(TEST_DIR, "test.py")) as f:
+        tree = ast.parse(f.read())
+    tests = []
+    for node in tree.body:
+        if isinstance(node, ast.AsyncFunctionDef):
+            for decorator in node.decorator_list:
+                if isinstance(decorator, ast.Call):
+                    decorator = decorator.func
+                if ast.unparse(decorator) == "cocotb.test":
+                    tests.append(node.name)
+    return tests
+
+@pytest.mark.parametrize("testcase", cocotb_tests())
+def test_prism(testcase):
+    run(
+        verilog_sources=makefile_sources(),
+        includes=[SRC_DIR],
+        defines=["SIM"],
+        compile_args=os.environ.get("EXTRA_ARGS", "").split(),
+        toplevel="tb",
+        module="test",
+        testcase=testcase,
+        python_search=[TEST_DIR],
+        sim_build=os.path.join(TEST_DIR, "sim_build", testcase),
+    )
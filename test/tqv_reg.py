@@ -3,7 +3,8 @@
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import ClockCycles
+from cocotb.triggers import ClockCycles, RisingEdge, Timer
+from cocotb.utils import get_sim_time
 
 def get_bit(value, bit_index):
   temp = value & (1 << bit_index)
@@ -52,101 +53,74 @@ def spi_mosi_low(value):
 def spi_miso_read(port):
   return (get_bit (port.value, 3) >> 3)
 
-async def spi_write_cpha0 (clk, port, address, data, width):
+def spi_write_frame_cpha0 (port_value, address, data, width):
 
-  temp = port.value;
-  result = pull_cs_high(temp)
-  port.value = result
-  await ClockCycles(clk, 10)
+  # Build the sequence of port values for one write transaction.
+  # Each value is held on the port for 10 clocks.
+  frame = []
 
-  # Pull CS low + Write command bit - bit 31 - MSBIT in first word
-  temp = port.value;
-  result = pull_cs_low(temp)
-  result2 = spi_mosi_high(result)
-  port.value = result2
-  await ClockCycles(clk, 10)
-  temp = port.value;
-  result = spi_clk_invert(temp)
-  port.value = result
-  await ClockCycles(clk, 10)
+  result = pull_cs_high(port_value)
+  frame.append(result)
 
-  # Next two bits indicate txn width
-  iterator = 1
-  while iterator >= 0:
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    address_bit = get_bit(width, iterator)
-    if (address_bit == 0):
-      result2 = spi_mosi_low(result)
+  # Pull CS low + Write command bit - bit 31 - MSBIT in first word
+  result = spi_mosi_high(pull_cs_low(result))
+  frame.append(result)
+  result = spi_clk_invert(result)
+  frame.append(result)
+
+  # Next two bits indicate txn width, then don't care - bits 28-6,
+  # then Address - bits 5-0 and finally Data - bits 31-0
+  bits  = [get_bit(width, i) for i in range(1, -1, -1)]
+  bits += [0] * 23
+  bits += [get_bit(address, i) for i in range(5, -1, -1)]
+  bits += [get_bit(data, i) for i in range(31, -1, -1)]
+
+  for bit in bits:
+    result = spi_clk_invert(result)
+    if (bit == 0):
+      result = spi_mosi_low(result)
     else:
-      result2 = spi_mosi_high(result)
-    port.value = result2
-    await ClockCycles(clk, 10)
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    port.value = result
-    await ClockCycles(clk, 10)
-    iterator -= 1
+      result = spi_mosi_high(result)
+    frame.append(result)
+    result = spi_clk_invert(result)
+    frame.append(result)
 
-  iterator = 0
-  while iterator < 23:
-    # Don't care - bits 28-6
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    result2 = spi_mosi_low(result)
-    port.value = result2
-    await ClockCycles(clk, 10)
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    port.value = result
-    await ClockCycles(clk, 10)
-    iterator += 1
+  result = spi_clk_invert(result)
+  frame.append(result)
 
-  iterator = 5
-  while iterator >= 0:
-    # Address[iterator] - bits 5-0
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    address_bit = get_bit(address, iterator)
-    if (address_bit == 0):
-      result2 = spi_mosi_low(result)
-    else:
-      result2 = spi_mosi_high(result)
-    port.value = result2
-    await ClockCycles(clk, 10)
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    port.value = result
-    await ClockCycles(clk, 10)
-    iterator -= 1
+  result = pull_cs_high(result)
+  frame.append(result)
 
-  iterator = 31
-  while iterator >= 0:
-    # Data[iterator]
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    data_bit = get_bit(data, iterator)
-    if (data_bit == 0):
-      result2 = spi_mosi_low(result)
-    else:
-      result2 = spi_mosi_high(result)
-    port.value = result2
-    await ClockCycles(clk, 10)
-    temp = port.value;
-    result = spi_clk_invert(temp)
-    port.value = result
-    await ClockCycles(clk, 10)
-    iterator -= 1
+  return frame
 
-  temp = port.value;
-  result = spi_clk_invert(temp)
-  port.value = result
-  await ClockCycles(clk, 10)
+# Clock period in simulator steps, keyed by clock handle
+clk_periods = {}
 
-  temp = port.value;
-  result = pull_cs_high(temp)
-  port.value = result
-  await ClockCycles(clk, 10)  
+async def get_clk_period (clk):
+
+  # Measure the period from two rising edges the first time a clock is used
+  if clk not in clk_periods:
+    await RisingEdge(clk)
+    start = get_sim_time('step')
+    await RisingEdge(clk)
+    clk_periods[clk] = get_sim_time('step') - start
+  return clk_periods[clk]
+
+async def spi_write_cpha0 (clk, port, address, data, width):
+
+  # The SPI inputs are synchronized inside the design, so instead of
+  # waking up on every clock edge, hold each port value for 10 clocks
+  # with a single Timer.  The write starts a quarter period after the
+  # next rising edge, clear of the edge, and ends on a rising edge.
+  period = await get_clk_period(clk)
+  await RisingEdge(clk)
+  await Timer(period // 4, 'step')
+
+  for result in spi_write_frame_cpha0(int(port.value), address, data, width):
+    port.value = result
+    await Timer(10 * period, 'step')
+
+  await RisingEdge(clk)
 
 
 async def spi_read_cpha0 (clk, port_in, port_out, data_ready, address, data, width):